@@ -1,7 +1,7 @@
 import logging
 import time
 
-from enum import Enum
+from concurrent.futures import Executor
 from typing import List
 from queue import Queue
 from threading import Thread
@@ -12,10 +12,20 @@ from .api.label import Label
 from .broker_connection import BrokerConnection
 from .handler import Handler
 from .qthread import QThread
+from .util.framing import decode_frames
 
-class State(Enum):
+logger = logging.getLogger(__name__)
+
+# Tags of the items in the queue of the QThread: a message to send to AMP, a message from AMP
+# to handle, or a length-delimited payload of messages from AMP to handle.
+_SEND = 'send'
+_HANDLE = 'handle'
+_HANDLE_FRAMES = 'handle_frames'
+
+class State:
     """
-    Enumeration describing the different state the adapter can be in.
+    The different states the adapter can be in.
+    Plain integers instead of an Enum, because the state is compared for every message.
     """
     DISCONNECTED = 0
     CONNECTED = 1
@@ -25,6 +35,13 @@ class State(Enum):
     ERROR = 9
 
 
+# Names of the states, for logging.
+_STATE_NAMES = {value: name for name, value in vars(State).items() if not name.startswith('_')}
+
+# States in which there is no connection with AMP to send messages over.
+_UNCONNECTED_STATES = frozenset({State.DISCONNECTED, State.ERROR})
+
+
 class AdapterCore:
     """
     This class implements the core of a plugin-adapter. It handles the connection
@@ -35,50 +52,71 @@ class AdapterCore:
         name (str): The communicated name of this adapter
         broker_connection (BrokerConnection): The broker connection does the communication to AMP
         handler (adapter.generic.handler.Handler): The handler that handles the communication to the SUT
+        executor (concurrent.futures.Executor): Optional executor for the qthread, e.g. to share threads
+            between adapter cores. By default the qthread has a thread of its own.
     """
 
-    def __init__(self, name: str, broker_connection: BrokerConnection, handler: Handler):
+    def __init__(self, name: str, broker_connection: BrokerConnection, handler: Handler, executor: Executor = None):
         self.name = name
         self.broker_connection = broker_connection
         self.handler = handler
         self.state = State.DISCONNECTED
 
-        # QThread for sending messages to AMP.
-        self.qthread_to_amp = QThread(process_item = self._send_message_to_amp)
-        self.qthread_to_amp.start()
-
-        # QThread for handling messages from AMP.
-        self.qthread_handle_message = QThread(process_item = self._handle_message)
-        self.qthread_handle_message.start()
+        # Handlers for the messages from AMP, keyed on the field set in the 'type' oneof of a Message.
+        self._message_handlers = {
+            'configuration': self.on_configuration,
+            'error': lambda pb_error: self.on_error(pb_error.message),
+            'label': self.on_label,
+            'reset': lambda _: self.on_reset(),
+        }
+
+        # Message reused for parsing every message from AMP; only the qthread uses it.
+        # Clear() detaches sub messages still referenced elsewhere, so handlers may keep those.
+        self._scratch_message = message_pb2.Message()
+
+        # QThread for both handling messages from AMP and sending messages to AMP.
+        # Only messages to AMP are batched: a message from AMP is taken off the queue on its own,
+        # so clearing the queue (see on_close) still discards every message that is not handled yet.
+        self.qthread = QThread(process_batch = self._process_items, executor = executor,
+                               batchable = lambda item: item[0] == _SEND)
+        self.qthread.start()
 
     def start(self):
         """ Start the adapter core which will open a connection with AMP. """
 
-        self._clear_qthread_queues()
+        self._clear_qthread_queue()
 
         if self.state == State.DISCONNECTED:
-            logging.info('Connecting to broker')
+            logger.info('Connecting to broker')
             self.broker_connection.connect()
         else:
-            logging.info('Connection started while already connected')
+            logger.info('Connection started while already connected')
+
+    def shutdown(self):
+        """
+        Stop handling and sending messages, and release the thread of the qthread.
+        The message being handled is finished; pending messages are dropped.
+        """
+        logger.info('Shutting down the adapter core')
+        self.qthread.shutdown()
 
     def on_open(self):
         """ Broker call back for when the connection is opened with AMP. """
         if self.state == State.DISCONNECTED:
             self.state = State.CONNECTED
 
-            self.send_announcement(self.name, self.handler.supported_labels(),
-                                   self.handler.get_configuration())
+            self.send_announcement(self.name, self.handler.supported_pb_labels(),
+                                   self.handler.get_pb_configuration())
             self.state = State.ANNOUNCED
         else:
-            logging.info('Connection opened while already connected')
+            logger.info('Connection opened while already connected')
 
     def on_close(self):
         """ Connection with AMP has been closed. Try to reconnect. """
         self.state = State.DISCONNECTED
-        self._clear_qthread_queues()
+        self._clear_qthread_queue()
         self.handler.stop()
-        logging.info('Trying to reconnect to AMP')
+        logger.info('Trying to reconnect to AMP')
         self.start() # reconnect to AMP - keep the adapter alive
 
     def on_configuration(self, pb_config: configuration_pb2.Configuration):
@@ -89,28 +127,28 @@ class AdapterCore:
             pb_config (configuration_pb2.Configuration)
         """
         if self.state == State.ANNOUNCED:
-            logging.info('Configuration received')
+            logger.info('Configuration received')
             self.state = State.CONFIGURED
 
             # Start the SUT
-            logging.info('Connecting to the SUT')
+            logger.info('Connecting to the SUT')
             try:
                 self.handler.set_configuration(Configuration.decode(pb_config))
                 self.handler.start()
 
             except Exception as e:
-                logging.error('Error connection to the SUT: {}'.format(e))
+                logger.error('Error connection to the SUT: %s', e)
                 self.send_error(str(e))
                 return
 
         elif self.state == State.CONNECTED:
             message = 'Configuration received while not yet announced'
-            logging.error(message)
+            logger.error(message)
             self.send_error(message)
 
         else:
             message = 'Configuration received while already configured'
-            logging.error(message)
+            logger.error(message)
             self.send_error(message)
 
     def on_label(self, pb_label: label_pb2.Label):
@@ -123,45 +161,47 @@ class AdapterCore:
         if self.state == State.READY:
             if pb_label.type != label_pb2.Label.LabelType.STIMULUS:
                 message = 'Label is not a stimulus'
-                logging.error(message)
+                logger.error(message)
                 self.send_error(message)
 
             try:
                 # Perform the stimulus action (which could trigger a response).
-                logging.debug("Call handler.stimulate for '{name}'".format(name=pb_label.label))
+                logger.debug("Call handler.stimulate for '%s'", pb_label.label)
                 self.handler.stimulate(pb_label)
 
             except Exception as e:
-                logging.error('Exception: {ex}'.format(ex=e))
-                self.send_error('error while stimulating the SUT: {ex}'.format(ex=e))
+                logger.error('Exception: %s', e)
+                self.send_error(f'error while stimulating the SUT: {e}')
         else:
             message = 'Label received from AMP while not ready'
-            logging.error(message)
+            logger.error(message)
             self.send_error(message)
 
     def on_reset(self):
         """ Call back when a Reset message is received. """
         if self.state == State.READY:
-            logging.debug('Reset message received')
-            self._clear_qthread_queues()
+            logger.debug('Reset message received')
+            # The queue is not cleared here: the qthread handles it in order, so all messages
+            # from AMP before the reset have been handled, and the confirmations and responses
+            # they caused are still pending in the queue; they must reach AMP before ready.
 
             try:
-                logging.debug('Resetting the SUT')
+                logger.debug('Resetting the SUT')
                 response = self.handler.reset()
                 if response:
-                    message = 'Resetting the SUT failed due to: {reason}'.format(reason=response)
-                    logging.error(message)
+                    message = f'Resetting the SUT failed due to: {response}'
+                    logger.error(message)
                     self.send_error(message)
                     return
 
             except Exception as e:
-                message = 'Error while resetting connection to the SUT: {reason}'.format(reason=str(e))
-                logging.error(message)
+                message = f'Error while resetting connection to the SUT: {e}'
+                logger.error(message)
                 self.send_error(message)
                 return
         else:
             message = 'Reset received while not ready'
-            logging.error(message)
+            logger.error(message)
             self.send_error(message)
 
     def on_error(self, message: str):
@@ -173,7 +213,7 @@ class AdapterCore:
         """
         self.state = State.ERROR
 
-        logging.error('Error message received: {msg}'.format(msg=message))
+        logger.error('Error message received: %s', message)
 
         # NOTE: we do not send an error message back.
         self.broker_connection.close(reason=message)
@@ -198,11 +238,12 @@ class AdapterCore:
         pb_label = label.encode()
 
         if pb_label.type == label_pb2.Label.LabelType.RESPONSE:
-            logging.info('Sending response to AMP: !{label}'.format(label=pb_label.label))
-            self._queue_message_to_amp(message_pb2.Message(label=pb_label))
+            logger.info('Sending response to AMP: !%s', pb_label.label)
+            # Serialize in the calling thread, so the sending QThread only has to send.
+            self._queue_message_to_amp(message_pb2.Message(label=pb_label).SerializeToString())
         else:
             message = 'Label is not of type Response'
-            logging.error(message)
+            logger.error(message)
             self.send_error(message)
 
     def send_ready(self):
@@ -210,24 +251,26 @@ class AdapterCore:
         Let AMP know the adapter is ready to start testing.
         """
 
-        logging.debug('Sending ready')
+        logger.debug('Sending ready')
         self._queue_message_to_amp(message_pb2.Message(ready=message_pb2.Message.Ready()))
         self.state = State.READY
 
-    def send_announcement(self, name: str, supported_labels: List[Label], configuration: Configuration):
+    def send_announcement(self, name: str, supported_labels: List[Label | label_pb2.Label],
+                          configuration: Configuration | configuration_pb2.Configuration):
         """
         Send an announcement to AMP to let the platform know this adapter is available.
+        Labels and configuration that are already encoded in Google Protobuf format are used as-is.
 
         Args:
             name (str): Name of the adapter
-            supported_labels ([Label]): Labels supported by this adapter
-            configuration (Configuration): Configuration items needed by this adapter
+            supported_labels ([Label | label_pb2.Label]): Labels supported by this adapter
+            configuration (Configuration | configuration_pb2.Configuration): Configuration items needed by this adapter
         """
 
-        logging.info('Announcing')
+        logger.info('Announcing')
 
-        pb_configuration = configuration.encode()
-        pb_supported_labels = [label.encode() for label in supported_labels]
+        pb_configuration = configuration.encode() if isinstance(configuration, Configuration) else configuration
+        pb_supported_labels = [label.encode() if isinstance(label, Label) else label for label in supported_labels]
         pb_announcement = announcement_pb2.Announcement(
             name=name, labels=pb_supported_labels, configuration=pb_configuration
         )
@@ -242,73 +285,145 @@ class AdapterCore:
         Args:
             pb_label (label_pb2.Label)
         """
-        logging.debug('Sending confirmation for stimulus ?{label} to AMP'.format(label=pb_label.label))
-        self._queue_message_to_amp(message_pb2.Message(label=pb_label))
+        logger.debug('Sending confirmation for stimulus ?%s to AMP', pb_label.label)
+        self._queue_message_to_amp(message_pb2.Message(label=pb_label).SerializeToString())
 
     def handle_message(self, raw_message:str):
         """
         Handle the message coming in from AMP.
-        Adds the message to the queue of messages to be handled by
-        qthread_handle_message.
+        Adds the message to the queue of the qthread, to be handled by _handle_message.
 
         Args:
             raw_message (str): Raw string message from AMP.
         """
-        logging.debug('Adding message (id: {id}) from AMP to the queue to be handled'.format(id=id(raw_message)))
-        self.qthread_handle_message.put(raw_message)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Adding message (id: %d) from AMP to the queue to be handled', id(raw_message))
+        self.qthread.put((_HANDLE, raw_message))
+
+    def handle_frame(self, buf: bytes):
+        """
+        Handle a length-delimited payload of messages coming in from AMP.
+        The payload is added to the queue of the qthread as a whole; it is split into
+        its messages when it is handled.
+
+        Args:
+            buf (bytes): Payload of varint length-prefixed messages from AMP.
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Adding framed messages (id: %d) from AMP to the queue to be handled', id(buf))
+        self.qthread.put((_HANDLE_FRAMES, buf))
 
     def _handle_message(self, raw_message:str):
         """
-        QThread's process_item method for processing a raw_message from AMP.
-        Handles the message from AMP.
+        Handles a raw_message from AMP. Called from the qthread, see _process_items.
 
         Args:
             raw_message (str): Raw string message from AMP.
         """
 
-        logging.debug('Starting the handling of message (id: {id}) from AMP'.format(id=id(raw_message)))
-        pb_message = message_pb2.Message()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Starting the handling of message (id: %d) from AMP', id(raw_message))
+        pb_message = self._scratch_message
+        pb_message.Clear()
 
         try:
             pb_message.ParseFromString(raw_message)
         except Exception as e:
-            logging.error('Could not decode message due to: {ex}'.format(ex=e))
-
-        if pb_message.HasField('configuration'):
-            logging.debug('Received a configuration')
-            self.on_configuration(pb_message.configuration)
-        elif pb_message.HasField('error'):
-            logging.debug('Received an error')
-            self.on_error(pb_message.error.message)
-        elif pb_message.HasField('label'):
-            logging.debug('Received a label')
-            self.on_label(pb_message.label)
-        elif pb_message.HasField('reset'):
-            logging.debug('Received a reset')
-            self.on_reset()
-        elif pb_message.HasField('ready'):
-            logging.debug('Received ready, this should not be send')
+            logger.error('Could not decode message due to: %s', e)
+
+        message_type = pb_message.WhichOneof('type')
+        handler = self._message_handlers.get(message_type)
+        if handler:
+            logger.debug('Received a %s message', message_type)
+            handler(getattr(pb_message, message_type))
+        elif message_type == 'ready':
+            logger.debug('Received ready, this should not be send')
         else:
-            logging.debug('Unknown message type: {msg}'.format(msg=pb_message))
+            logger.debug('Unknown message type: %s', pb_message)
 
-    def _clear_qthread_queues(self):
-        logging.info('Clearing queues with pending messages')
-        self.qthread_to_amp.clear_queue()
-        self.qthread_handle_message.clear_queue()
+    def _handle_frames(self, buf: bytes):
+        """
+        Handles each message in a length-delimited payload from AMP. Called from the qthread, see _process_items.
+
+        Args:
+            buf (bytes): Payload of varint length-prefixed messages from AMP.
+        """
+        try:
+            raw_messages = decode_frames(buf)
+        except ValueError as e:
+            logger.error('Could not split framed messages due to: %s', e)
+            return
+
+        for raw_message in raw_messages:
+            self._handle_message(raw_message)
+
+    def _clear_qthread_queue(self):
+        logger.info('Clearing queue with pending messages')
+        self.qthread.clear_queue()
 
-    def _queue_message_to_amp(self, message: message_pb2.Message):
+    def _queue_message_to_amp(self, message: message_pb2.Message | bytes):
         """
         Adds message to the queue of pending messages to AMP.
-        Separate thread takes care of the actual sending of the message.
-        See the worker _send_message_to_amp below.
+        The qthread takes care of the actual sending of the message.
+        See _send_messages_to_amp below.
 
         Args:
-            message (message_pb2.Message)
+            message (message_pb2.Message | bytes): The message, or the already serialized message
         """
-        logging.debug('Adding message to the queue ({id})'.format(id=id(message)))
-        self.qthread_to_amp.put(message)
+        if self.state in _UNCONNECTED_STATES:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Not connected to AMP (%s), dropping message', _STATE_NAMES[self.state])
+            return
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Adding message to the queue (%d)', id(message))
+        self.qthread.put((_SEND, message))
+
+    def _send_messages_to_amp(self, messages: List[message_pb2.Message | bytes]):
+        """ Sends contiguous pending messages to AMP at once. Called from the qthread, see _process_items. """
+        if self.state in _UNCONNECTED_STATES:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Not connected to AMP (%s), dropping %d messages',
+                             _STATE_NAMES[self.state], len(messages))
+            return
+
+        logger.debug('Sending %d messages to AMP', len(messages))
+        self.broker_connection.send_batch([message if isinstance(message, bytes) else message.SerializeToString()
+                                           for message in messages])
+
+    def _process_items(self, items):
+        """
+        QThread's process_batch method. Handles the messages from AMP in order, and sends
+        each run of contiguous pending messages to AMP at once.
+        Exceptions are logged per item, so a bad message does not drop the messages after it.
+
+        Args:
+            items ([(str, object)]): Tagged messages drained from the queue of the qthread
+        """
+        pending = []
+        for tag, item in items:
+            if tag == _SEND:
+                pending.append(item)
+                continue
 
-    def _send_message_to_amp(self, message):
-        """ QThread's process_item method for sending a message to AMP. """
-        logging.debug('Sending message to AMP ({id})'.format(id=id(message)))
-        self.broker_connection.send(message.SerializeToString())
+            if pending:
+                self._send_pending_messages(pending)
+                pending = []
+
+            try:
+                if tag == _HANDLE:
+                    self._handle_message(item)
+                else:
+                    self._handle_frames(item)
+            except Exception:
+                logger.exception('Error while handling message (id: %d) from AMP', id(item))
+
+        if pending:
+            self._send_pending_messages(pending)
+
+    def _send_pending_messages(self, messages: List[message_pb2.Message | bytes]):
+        """ Sends the messages with _send_messages_to_amp, logging instead of raising an exception. """
+        try:
+            self._send_messages_to_amp(messages)
+        except Exception:
+            logger.exception('Error while sending %d messages to AMP', len(messages))
@@ -21,7 +21,7 @@ class Label:
     """
 
     def __init__(self, sort: Sort, name: str, channel: str, parameters: List[Parameter] = None,
-                 timestamp: datetime = None, physical_label: bytes = None, correlation_id: int = 0):
+                 timestamp: datetime | int = None, physical_label: bytes = None, correlation_id: int = 0):
         parameters = parameters or []
 
         if not isinstance(sort, Sort):
@@ -59,7 +59,10 @@ class Label:
             parameters=[param.encode() for param in self.parameters],
         )
 
-        if self.timestamp:
+        if isinstance(self.timestamp, int):
+            # Already in nanoseconds since the epoch, e.g. from time.time_ns().
+            pb_label.timestamp = self.timestamp
+        elif self.timestamp:
             pb_label.timestamp = int(self.timestamp.timestamp() * 1e9)
         if self.physical_label:
             pb_label.physical_label = self.physical_label
@@ -1,6 +1,10 @@
 import logging
 import websocket
 
+from .util.framing import encode_frames
+
+logger = logging.getLogger(__name__)
+
 class BrokerConnection:
     """
     This class holds the connection with the Axini Modeling Platform. It is responsible
@@ -11,11 +15,14 @@ class BrokerConnection:
     Attributes:
         url (str): The websocket URL of the AMP instance that should be connected to.
         token (str): Token to authorize with.
+        framed (bool): Exchange batches of length-delimited messages instead of a single
+            message per websocket frame. Requires a broker that supports this framing.
     """
 
-    def __init__(self, url, token):
+    def __init__(self, url, token, framed=False):
         self.url = url
         self.token = token
+        self.framed = framed
         self.adapter_core = None  # callback to adapter; register separately
         self.websocket = None  # reference to websocket; initialized on #connect
 
@@ -32,7 +39,7 @@ class BrokerConnection:
         """
         Connect to the Axini Modeling Platform
         """
-        logging.info('Connecting to AMP')
+        logger.info('Connecting to AMP')
 
         self.websocket = websocket.WebSocketApp(
             self.url,
@@ -40,7 +47,7 @@ class BrokerConnection:
             on_close=lambda _, close_status_code, close_msg: self.on_close(close_status_code, close_msg),
             on_message=lambda _, msg: self.on_message(msg),
             on_error=lambda _, msg: self.on_error(msg),
-            header={'Authorization': 'Bearer {token}'.format(token=self.token)},
+            header={'Authorization': f'Bearer {self.token}'},
         )
 
         self.websocket.run_forever()
@@ -49,7 +56,7 @@ class BrokerConnection:
         """
         Callback handler for when the connection with the Axini Modeling Platform is opened.
         """
-        logging.info('Successfully opened a connection')
+        logger.info('Successfully opened a connection')
         self.adapter_core.on_open()
 
     def on_close(self, close_status_code, close_msg):
@@ -60,8 +67,8 @@ class BrokerConnection:
             close_status_code (int): The status code returned by closing the connection
             close_msg (str): The reason for the connection termination.
         """
-        logging.info('WebSocket connection has been closed with code: {code}, with reason: {reason}'
-                     .format(code=close_status_code, reason=close_msg))
+        logger.info('WebSocket connection has been closed with code: %s, with reason: %s',
+                    close_status_code, close_msg)
         self.adapter_core.on_close()
 
     def on_message(self, message):
@@ -71,8 +78,11 @@ class BrokerConnection:
         Args:
             message (str): The message that was sent by the Axini Modeling Platform.
         """
-        logging.debug('Received a message: {msg}'.format(msg=message))
-        self.adapter_core.handle_message(message)
+        logger.debug('Received a message: %s', message)
+        if self.framed:
+            self.adapter_core.handle_frame(message)
+        else:
+            self.adapter_core.handle_message(message)
 
     def on_error(self, err):
         """
@@ -81,10 +91,10 @@ class BrokerConnection:
         Args:
             err (str): Error message
         """
-        logging.error('Got a connection error: {error}'.format(error=err))
+        logger.error('Got a connection error: %s', err)
         self.adapter_core.send_error(err)
 
-        logging.debug('Closing the connection...')
+        logger.debug('Closing the connection...')
         self.websocket.close()
 
     def close(self, reason='', code=-1):
@@ -96,11 +106,11 @@ class BrokerConnection:
             code (int): The status code (default -1)
         """
         if self.websocket:
-            logging.info('Closing the connection due to: {reason}'.format(reason=reason))
-            logging.info('With error code: {code}'.format(code=code))
+            logger.info('Closing the connection due to: %s', reason)
+            logger.info('With error code: %s', code)
             self.websocket.close()
         else:
-            logging.warning('No websocket initialized to close')
+            logger.warning('No websocket initialized to close')
 
     def send(self, raw_message):
         """
@@ -110,11 +120,25 @@ class BrokerConnection:
             raw_message (str): The message to send to the Axini Modeling Platform
         """
         if not self.websocket:
-            logging.warning('No connection to websocket (yet). Is the adapter connected to AMP?')
+            logger.warning('No connection to websocket (yet). Is the adapter connected to AMP?')
         else:
             try:
-                logging.debug('Sending out message: {msg}'.format(msg=raw_message))
+                logger.debug('Sending out message: %s', raw_message)
                 self.websocket.send(raw_message, websocket.ABNF.OPCODE_BINARY)
-                logging.debug('Success send')
+                logger.debug('Success send')
             except Exception as e:
-                logging.error('Failed sending message, exception: {ex}'.format(ex=e))
+                logger.error('Failed sending message, exception: %s', e)
+
+    def send_batch(self, raw_messages):
+        """
+        Sends the given messages to the Axini Modeling Platform. If the connection is framed,
+        the messages are combined into as few length-delimited payloads as possible.
+
+        Args:
+            raw_messages ([bytes]): The serialized messages to send to the Axini Modeling Platform
+        """
+        if self.framed:
+            raw_messages = encode_frames(raw_messages)
+
+        for raw_message in raw_messages:
+            self.send(raw_message)
@@ -1,9 +1,9 @@
 import logging
 
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Sequence
 
-from generic.api import label_pb2
+from generic.api import configuration_pb2, label_pb2
 from generic.api.configuration import Configuration
 from generic.api.label import Label
 
@@ -14,6 +14,7 @@ class Handler(ABC):
 
     def __init__(self):
         self.adapter_core = None  # callback to adapter; register separately
+        self._pb_supported_labels = None  # encoded on first use, see supported_pb_labels
 
     def register_adapter_core(self, adapter_core):
         """
@@ -33,6 +34,24 @@ class Handler(ABC):
         """ The current configuration of the adapter. """
         return self.configuration
 
+    def get_pb_configuration(self) -> configuration_pb2.Configuration:
+        """ The current configuration of the adapter (see `get_configuration`) in Google Protobuf format. """
+        return self.get_configuration().encode()
+
+    def supported_pb_labels(self) -> Sequence[label_pb2.Label]:
+        """
+        The labels supported by the adapter in Google Protobuf format.
+        The supported labels are static, so they are encoded once, on first use.
+        Subclasses that already have them encoded can override this method.
+
+        Returns:
+            (label_pb2.Label): The supported labels.
+        """
+        if self._pb_supported_labels is None:
+            self._pb_supported_labels = tuple(label.encode() for label in self.supported_labels())
+
+        return self._pb_supported_labels
+
     @abstractmethod
     def start(self):
         """
@@ -1,41 +1,167 @@
 import logging
 
-from queue import Queue
-from threading import Thread
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+class LockFreeQueue:
+    """
+    Unbounded FIFO queue without a lock around put and get.
+    It relies on `deque.append` and `deque.popleft` being atomic, so any number of
+    producers can put items while a single consumer gets them.
+    Note that `QThread.put` may still take a (non-blocking) lock to schedule its worker.
+    """
+
+    def __init__(self):
+        self.items = deque()
+
+    def __len__(self):
+        return len(self.items)
+
+    def empty(self):
+        return not self.items
+
+    def put(self, item):
+        self.items.append(item)
+
+    def clear(self):
+        """
+        Remove all items by swapping in an empty deque, instead of popping them one by one.
+
+        Returns:
+            int: The number of items removed
+        """
+        items, self.items = self.items, deque()
+        return len(items)
+
+    def get_nowait(self):
+        """ Remove and return the oldest item, raise `queue.Empty` if there is none. """
+        try:
+            return self.items.popleft()
+        except IndexError:
+            raise Empty from None
+
+    def get_nowait_if(self, predicate):
+        """ Remove and return the oldest item if predicate holds for it, raise `queue.Empty` otherwise. """
+        # Only the single consumer removes items, so the oldest item can not change in between.
+        items = self.items
+        if items and predicate(items[0]):
+            return items.popleft()
+
+        raise Empty
 
 class QThread:
     """
-    Class that manages a thread which processes items in a queue.
+    Class that manages the processing of items in a queue on a thread of an executor.
     Items can be added to the queue, and the queue can be emptied.
+    Items are processed one drain at a time, so in the order in which they were added.
+    The QThread only occupies a thread of the executor while it has items to process,
+    so no thread is left waiting on an empty queue.
     """
 
-    def __init__(self, process_item):
+    def __init__(self, process_item=None, process_batch=None, max_batch_size=64, executor=None, batchable=None):
         """
         Constructor.
         Args:
             process_item(item): method which is called for an item
                                 retrieved from the queue by the _worker
+            process_batch(items): method which is called for a list of contiguous items
+                                  drained from the queue by the _worker; takes
+                                  precedence over process_item
+            max_batch_size(int): maximum number of items passed to process_batch at once
+            executor(concurrent.futures.Executor): executor to process the items on; it may be
+                                                   shared between QThreads. By default the QThread
+                                                   creates (and on shutdown, shuts down) its own
+                                                   executor with a single thread.
+            batchable(item): predicate for the items that process_batch may get together with
+                             the contiguous batchable items after them; any other item is passed
+                             to process_batch on its own (default: all items are batchable)
         """
         self.process_item = process_item
-        self.queue = Queue()
-        self.thread = Thread(target = self._worker)
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.batchable = batchable
+        self.queue = LockFreeQueue()
+        self.started = False
+
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='qthread')
+
+        # Held while a _worker for this QThread is submitted to or running on the executor.
+        self._scheduled = Lock()
 
     def start(self):
-        self.thread.start()
+        self.started = True
+        self._schedule()
+
+    def shutdown(self, wait=False):
+        """
+        Stop processing items. The item being processed is finished, but items still in
+        the queue, or put after the shutdown, are not processed anymore.
+        The executor is only shut down if the QThread created it.
+
+        Args:
+            wait(bool): wait for the item being processed to finish (default False)
+        """
+        self.started = False
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
 
     def put(self, item):
-        logging.debug('Adding item to the queue ({id})'.format(id=id(item)))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Adding item to the queue (%d)', id(item))
         self.queue.put(item)
+        self._schedule()
 
     def clear_queue(self):
-        while not self.queue.empty():
-            item = self.queue.get()
-            logging.debug('Removing item from queue ({id})'.format(id=id(item)))
-            self.queue.task_done()
+        count = self.queue.clear()
+        logger.debug('Removed %d items from queue', count)
+
+    def _schedule(self):
+        """ Submit a _worker to the executor, unless one is already submitted or running. """
+        # Checking locked() first avoids taking the lock on every put while a _worker is busy;
+        # a _worker that releases it in the meantime checks the queue again, see _worker.
+        if self.started and not self._scheduled.locked() and self._scheduled.acquire(blocking=False):
+            self._executor.submit(self._worker)
 
     def _worker(self):
+        """ Process items until the queue is empty, then give the executor thread back. """
         while True:
-            item = self.queue.get()
-            logging.debug('Processing item from queue ({id})'.format(id=id(item)))
-            self.process_item(item)
-            self.queue.task_done()
+            while self.started:
+                try:
+                    item = self.queue.get_nowait()
+                except Empty:
+                    break
+
+                try:
+                    if self.process_batch:
+                        self._process_batch(item)
+                    else:
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug('Processing item from queue (%d)', id(item))
+                        self.process_item(item)
+                except Exception:
+                    logger.exception('Error while processing item from queue')
+
+            self._scheduled.release()
+
+            # An item put after the queue was found empty, but before the release, did not
+            # schedule a new _worker: continue with it, unless another put scheduled one already.
+            if not self.started or self.queue.empty() or not self._scheduled.acquire(blocking=False):
+                return
+
+    def _process_batch(self, first):
+        items = [first]
+        batchable = self.batchable
+        if batchable is None or batchable(first):
+            while len(items) < self.max_batch_size:
+                try:
+                    items.append(self.queue.get_nowait_if(batchable) if batchable else self.queue.get_nowait())
+                except Empty:
+                    break
+
+        logger.debug('Processing %d items from queue', len(items))
+        self.process_batch(items)
@@ -0,0 +1,115 @@
+from typing import List, Tuple
+
+# Upper bound on the size of a single framed payload, to bound the latency of a batch.
+MAX_BATCH_BYTES = 64 * 1024
+
+# Lengths below 128 are encoded in a single byte; these are shared instead of allocated per frame.
+_SINGLE_BYTE_VARINTS = [bytes((value,)) for value in range(0x80)]
+
+
+def encode_varint(value: int) -> bytes:
+    """
+    Encode a non-negative integer as a Protobuf base 128 varint.
+
+    Args:
+        value (int): The integer to encode
+
+    Returns:
+        bytes: The encoded varint
+    """
+    if value < 0x80:
+        return _SINGLE_BYTE_VARINTS[value]
+
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+    return bytes(out)
+
+
+def decode_varint(buf: bytes, pos: int = 0) -> Tuple[int, int]:
+    """
+    Decode a Protobuf base 128 varint from buf, starting at pos.
+
+    Args:
+        buf (bytes): Buffer holding the varint
+        pos (int): Offset of the first byte of the varint (default 0)
+
+    Returns:
+        (int, int): The decoded integer and the offset directly after the varint
+    """
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ValueError('Truncated varint')
+
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+
+        shift += 7
+
+
+def encode_frames(frames: List[bytes], max_batch_bytes: int = MAX_BATCH_BYTES) -> List[bytes]:
+    """
+    Concatenate the frames into length-delimited payloads: each frame is prefixed
+    with its length as a varint. A payload is split off as soon as adding the next
+    frame would exceed max_batch_bytes; a single frame larger than that gets a payload of its own.
+
+    Args:
+        frames ([bytes]): The serialized messages
+        max_batch_bytes (int): Maximum size of a single payload (default MAX_BATCH_BYTES)
+
+    Returns:
+        [bytes]: The framed payloads
+    """
+    # Collect the parts of a payload and join them once, instead of growing a bytes
+    # object per frame (which copies the payload over and over again).
+    payloads = []
+    parts = []
+    size = 0
+    for frame in frames:
+        prefix = encode_varint(len(frame))
+        frame_size = len(prefix) + len(frame)
+        if parts and size + frame_size > max_batch_bytes:
+            payloads.append(b''.join(parts))
+            parts = []
+            size = 0
+
+        parts.append(prefix)
+        parts.append(frame)
+        size += frame_size
+
+    if parts:
+        payloads.append(b''.join(parts))
+
+    return payloads
+
+
+def decode_frames(buf: bytes) -> List[bytes]:
+    """
+    Split a length-delimited payload (see `encode_frames`) into its frames.
+
+    Args:
+        buf (bytes): The framed payload
+
+    Returns:
+        [bytes]: The serialized messages
+    """
+    frames = []
+    pos = 0
+    while pos < len(buf):
+        size, pos = decode_varint(buf, pos)
+        end = pos + size
+        if end > len(buf):
+            raise ValueError('Truncated frame')
+
+        frames.append(buf[pos:end])
+        pos = end
+
+    return frames
@@ -1,7 +1,7 @@
 import logging
 import time
 
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from generic.api import label_pb2
 from generic.api.configuration import ConfigurationItem, Configuration
@@ -9,6 +9,20 @@ from generic.api.label import Label, Sort
 from generic.api.parameter import Type, Parameter
 from generic.handler import Handler as AbstractHandler
 
+logger = logging.getLogger(__name__)
+
+_time_ns = time.time_ns
+
+# Labels whose SUT command carries the value of their first parameter.
+_PARAMETRIC = frozenset({'lock', 'unlock'})
+
+# Number of threads performing stimuli at the SUT. A single thread keeps the stimuli in order.
+_SUT_WORKERS = 1
+
+# Seconds a reset waits for the pending stimuli to finish. The reset runs on the thread of the
+# adapter core that also sends the messages to AMP, so it must not wait for a hung SUT forever.
+_RESET_TIMEOUT = 10
+
 def _response(name, channel='matrix', parameters=None):
     """ Helper method to create a response Label. """
     return Label(Sort.RESPONSE, name, channel, parameters=parameters)
@@ -17,6 +31,29 @@ def _stimulus(name, channel='matrix', parameters=None):
     """ Helper method to create a stimulus Label. """
     return Label(Sort.STIMULUS, name, channel, parameters=parameters)
 
+# TODO This list should contain the labels your SUT supports
+_SUPPORTED_LABELS = (
+    _stimulus('open'),
+    _response('opened'),
+    _stimulus('close'),
+    _response('closed'),
+
+    # old labels for SmartDoor, left here to give Syntax for parameters (if you need those)
+    # _stimulus('lock', parameters=[Parameter('passcode', Type.INTEGER)]),
+    # _response('locked'),
+    # _stimulus('unlock', parameters=[Parameter('passcode', Type.INTEGER)]),
+    # _response('unlocked'),
+    # _stimulus('reset'),
+    # _response('invalid_command'),
+    # _response('invalid_passcode'),
+    # _response('incorrect_passcode'),
+    # _response('shut_off'),
+)
+
+# The supported labels are static, so they are encoded once for the announcements.
+# Both are tuples, so callers can not change the shared labels.
+_SUPPORTED_PB_LABELS = tuple(label.encode() for label in _SUPPORTED_LABELS)
+
 class Handler(AbstractHandler):
     """
     This class handles the interaction between AMP and the Matrix SUT.
@@ -25,6 +62,21 @@ class Handler(AbstractHandler):
     def __init__(self):
         super().__init__()
 
+        # Translation tables between the names of the supported labels and the SUT messages:
+        # stimuli are sent as upper-cased commands, responses come back either as the
+        # label name itself or upper-cased (as the SmartDoor SUT did).
+        labels = self.supported_labels()
+        self._name_to_sut = {label.name: label.name.upper() for label in labels if label.sort == Sort.STIMULUS}
+        self._sut_to_name = {message: label.name for label in labels if label.sort == Sort.RESPONSE
+                             for message in (label.name, label.name.upper())}
+        # Physical labels of these SUT messages, shared instead of encoded per message.
+        self._physical_labels = {message: message.encode('UTF-8')
+                                 for message in [*self._name_to_sut.values(), *self._sut_to_name]}
+
+        # Executor performing the (blocking) stimuli at the SUT, and the stimuli it has not finished yet.
+        self._executor = ThreadPoolExecutor(max_workers=_SUT_WORKERS, thread_name_prefix='matrix-sut')
+        self._pending = set()
+
     # TODO In case you don't use sockets, there's no need to change this method. 
     # TODO Just call it from stimulate when you receive the response of your SUT.
     def send_message_to_amp(self, raw_message: str):
@@ -34,7 +86,7 @@ class Handler(AbstractHandler):
         Args:
             raw_message (str): The message to send to AMP.
         """
-        logging.debug('response received: {label}'.format(label=raw_message))
+        logger.debug('response received: %s', raw_message)
 
         if raw_message == 'RESET_PERFORMED':
             # After 'RESET_PERFORMED', the SUT is ready for a new test case.
@@ -63,14 +115,25 @@ class Handler(AbstractHandler):
     def reset(self):
         """
         Prepare the SUT for the next test case.
+
+        Returns:
+            str: The reason the reset failed, or None if it succeeded.
         """
-        logging.info('Resetting the SUT for a new test case')
+        logger.info('Resetting the SUT for a new test case')
 
         # old methods for SmartDoor
         # self.sut.send('RESET')
 
         # TODO RESET!!
 
+        # Let the SUT finish the stimuli of the previous test case, so their
+        # confirmations and responses are sent before the reset is.
+        _, not_done = wait(list(self._pending), timeout=_RESET_TIMEOUT)
+        if not_done:
+            for future in not_done:
+                future.cancel()
+            return f'{len(not_done)} stimuli did not finish within {_RESET_TIMEOUT} seconds'
+
         # make sure to send this to AMP too, so it knows that the SUT has reset
         self.send_message_to_amp("RESET_PERFORMED")
 
@@ -78,15 +141,19 @@ class Handler(AbstractHandler):
         """
         Stop the SUT from testing.
         """
-        logging.info('Stopping the plugin handler')
+        logger.info('Stopping the plugin handler')
 
         # old methods for SmartDoor
         # self.sut.stop()
         # self.sut = None
 
         # TODO STOP!!
-        
-        logging.debug('Finished stopping the plugin handler')
+
+        # The connection with AMP is gone: drop the stimuli that have not reached the SUT yet.
+        for future in list(self._pending):
+            future.cancel()
+
+        logger.debug('Finished stopping the plugin handler')
 
     def stimulate(self, pb_label: label_pb2.Label):
         """
@@ -99,53 +166,90 @@ class Handler(AbstractHandler):
         label = Label.decode(pb_label)
         sut_msg = self._label2message(label)
 
+        # Perform the stimulus on the executor, so the adapter core can handle
+        # the next message from AMP while the SUT is busy. The label is copied,
+        # as the executor fills it in after the adapter core has moved on.
+        pb_confirmation = label_pb2.Label()
+        pb_confirmation.CopyFrom(pb_label)
+        future = self._executor.submit(self._perform_stimulus, pb_confirmation, label.name, sut_msg)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    def _sut_send(self, pb_label: label_pb2.Label, name: str, sut_msg: str):
+        """
+        Performs a stimulus at the SUT. Runs on the executor, so it is allowed to block.
+        The stimulus is confirmed to AMP right before it is sent to the SUT.
+
+        Args:
+            pb_label (label_pb2.Label): The stimulus to confirm
+            name (str): Name of the stimulus label
+            sut_msg (str): The message to be sent to the SUT
+        Returns:
+            str: The response of the SUT, or None if there is no response.
+        """
+
         # send confirmation of stimulus back to AMP
-        pb_label.timestamp = time.time_ns()
-        pb_label.physical_label = bytes(sut_msg, 'UTF-8')
+        pb_label.timestamp = _time_ns()
+        pb_label.physical_label = self._physical_label(sut_msg)
         self.adapter_core.send_stimulus_confirmation(pb_label)
 
         # leading spaces are needed to justify the stimuli and responses
-        logging.info('      Injecting stimulus @SUT: ?{name}'.format(name=label.name))
-        
+        logger.info('      Injecting stimulus @SUT: ?%s', name)
+
         # old methods for SmartDoor
         # self.sut.send(sut_msg)
-        
+
         # TODO SENDING!!
 
         # this is some example sending, should be replaced by your own logic.
         time.sleep(0.25)
-        if label.name == "open":
+        if name == "open":
             # TODO ACTION ON REAL SUT
-            self.send_message_to_amp("opened")
-        elif label.name == "close":
+            return "opened"
+        elif name == "close":
             # TODO ACTION ON REAL SUT
-            self.send_message_to_amp("closed")
+            return "closed"
 
-    # TODO This method should contain the labels your SUT supports
+        return None
+
+    def _perform_stimulus(self, pb_label: label_pb2.Label, name: str, sut_msg: str):
+        """
+        Task run on the executor: performs the stimulus with _sut_send and sends the response to AMP.
+        The response is sent from the task itself, so it is queued before the task counts as done.
+
+        Args:
+            pb_label (label_pb2.Label): The stimulus to confirm
+            name (str): Name of the stimulus label
+            sut_msg (str): The message to be sent to the SUT
+        """
+        try:
+            response = self._sut_send(pb_label, name, sut_msg)
+        except Exception as e:
+            logger.error('Exception: %s', e)
+            self.adapter_core.send_error(f'error while stimulating the SUT: {e}')
+            return
+
+        if response is not None:
+            self.send_message_to_amp(response)
+
+    # TODO The labels your SUT supports go in _SUPPORTED_LABELS at the top of this file
     def supported_labels(self):
         """
         The labels supported by the adapter.
 
         Returns:
-             [Label]: List of all supported labels of this adapter
-        """
-        return [
-            _stimulus('open'),
-            _response('opened'),
-            _stimulus('close'),
-            _response('closed'),
-
-            # old labels for SmartDoor, left here to give Syntax for parameters (if you need those)
-            # _stimulus('lock', parameters=[Parameter('passcode', Type.INTEGER)]),
-            # _response('locked'),
-            # _stimulus('unlock', parameters=[Parameter('passcode', Type.INTEGER)]),
-            # _response('unlocked'),
-            # _stimulus('reset'),
-            # _response('invalid_command'),
-            # _response('invalid_passcode'),
-            # _response('incorrect_passcode'),
-            # _response('shut_off'),
-        ]
+             (Label): All supported labels of this adapter
+        """
+        return _SUPPORTED_LABELS
+
+    def supported_pb_labels(self):
+        """
+        The labels supported by the adapter in Google Protobuf format.
+
+        Returns:
+             (label_pb2.Label): All supported labels of this adapter, encoded at import
+        """
+        return _SUPPORTED_PB_LABELS
 
     # TODO This method is only useful if you have to make a connection to some API
     # TODO If you just use Python, you can safely ignore this. Should not give bugs :)
@@ -175,14 +279,11 @@ class Handler(AbstractHandler):
             str: The message to be sent to the SUT.
         """
 
-        sut_msg = None
-        command_name = label.name.upper()
-        if label.name in ['lock', 'unlock']:
-            sut_msg = '{msg}:{passcode}'.format(msg=command_name, passcode=label.parameters[0].value)
-        else:
-            sut_msg = '{msg}'.format(msg=command_name)
+        command_name = self._name_to_sut.get(label.name) or label.name.upper()
+        if label.name in _PARAMETRIC:
+            return f'{command_name}:{label.parameters[0].value}'
 
-        return sut_msg
+        return command_name
 
     def _message2label(self, message: str):
         """
@@ -194,12 +295,24 @@ class Handler(AbstractHandler):
             Label: The converted message as a Label.
         """
 
-        label_name = message.lower()
+        label_name = self._sut_to_name.get(message) or message.lower()
         label = Label(
             sort=Sort.RESPONSE,
             name=label_name,
             channel='matrix',
-            physical_label=bytes(message, 'UTF-8'),
-            timestamp=datetime.now())
+            physical_label=self._physical_label(message),
+            timestamp=_time_ns())
 
         return label
+
+    def _physical_label(self, message: str):
+        """
+        The physical label of a SUT message: the cached bytes of a known command,
+        otherwise the message encoded on the spot.
+
+        Args:
+            message (str)
+        Returns:
+            bytes: The message as sent to or received from the SUT.
+        """
+        return self._physical_labels.get(message) or message.encode('UTF-8')
@@ -9,7 +9,7 @@ from matrix.handler import Handler
 ADAPTER_NAME = 'Matrix'
 
 # TODO This is the main class, for if you want to figure the code out.
-def start_plugin_adapter(adapter_name: str, url: str, token: str, loglevel: int):
+def start_plugin_adapter(adapter_name: str, url: str, token: str, loglevel: int, framed: bool = False):
     """
     Start the adapter and connect with AMP.
 
@@ -18,6 +18,7 @@ def start_plugin_adapter(adapter_name: str, url: str, token: str, loglevel: int)
         url (str): Url of the Axini Modeling Platform
         token (str): Token needed to authenticate with the Axini Modeling Platform
         loglevel (int): Loglevel constant
+        framed (bool): Batch messages to and from AMP into length-delimited payloads
     """
     logging.basicConfig(
         level=loglevel,
@@ -25,7 +26,7 @@ def start_plugin_adapter(adapter_name: str, url: str, token: str, loglevel: int)
         datefmt='%Y-%m-%d %H:%M:%S'
     )
 
-    broker_connection = BrokerConnection(url, token)
+    broker_connection = BrokerConnection(url, token, framed=framed)
     handler = Handler()
 
     adapter_core = AdapterCore(adapter_name, broker_connection, handler)
@@ -33,7 +34,10 @@ def start_plugin_adapter(adapter_name: str, url: str, token: str, loglevel: int)
     broker_connection.register_adapter_core(adapter_core)
     handler.register_adapter_core(adapter_core)
 
-    adapter_core.start()
+    try:
+        adapter_core.start()
+    finally:
+        adapter_core.shutdown()
 
 if __name__ == '__main__':
     print("Parsing arguments")
@@ -47,6 +51,8 @@ if __name__ == '__main__':
     parser.add_argument('-ll', '--log_level',
                         help='AMP Adapter logger level: ERROR, WARNING, INFO, DEBUG (default: INFO)',
                         required=False)
+    parser.add_argument('-f', '--framed', action='store_true',
+                        help='Batch messages into length-delimited payloads (requires broker support)')
 
     args = parser.parse_args()
 
@@ -62,4 +68,4 @@ if __name__ == '__main__':
     else:
         log_level = args.log_level
 
-    start_plugin_adapter(name, args.url, args.token, log_level)
+    start_plugin_adapter(name, args.url, args.token, log_level, framed=args.framed)
@@ -1,3 +1,5 @@
+import time
+
 from datetime import datetime
 
 import pytest
@@ -74,6 +76,19 @@ def test_label_can_be_encoded():
     )
 
 
+def test_label_with_timestamp_in_nanoseconds_can_be_encoded():
+    ts = time.time_ns()
+
+    label = Label(Sort.RESPONSE, 'some_label', 'some_channel', timestamp=ts)
+
+    assert label.encode() == label_pb2.Label(
+        label='some_label',
+        type=Sort.RESPONSE.value,
+        channel='some_channel',
+        timestamp=ts
+    )
+
+
 def test_label_can_be_decoded():
     ts = datetime.now()
 
@@ -0,0 +1,21 @@
+from adapter.generic.adapter_core import AdapterCore, State, _HANDLE_FRAMES, _SEND
+
+
+class _BrokerConnection:
+    def __init__(self):
+        self.batches = []
+
+    def send_batch(self, messages):
+        self.batches.append(messages)
+
+
+def test_a_failing_message_does_not_drop_the_messages_around_it():
+    broker_connection = _BrokerConnection()
+    adapter_core = AdapterCore('test', broker_connection, handler=None)
+    adapter_core.qthread.shutdown(wait=True)
+    adapter_core.state = State.READY
+
+    # A text frame on a framed connection can not be split into messages.
+    adapter_core._process_items([(_SEND, b'before'), (_HANDLE_FRAMES, 'text'), (_SEND, b'after')])
+
+    assert broker_connection.batches == [[b'before'], [b'after']]
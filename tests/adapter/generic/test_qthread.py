@@ -0,0 +1,223 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from adapter.generic.qthread import LockFreeQueue, QThread
+
+
+def _wait_for(event):
+    assert event.wait(timeout=10)
+
+
+def test_items_are_processed_in_order():
+    processed = []
+    done = threading.Event()
+
+    def process_item(item):
+        processed.append(item)
+        if len(processed) == 100:
+            done.set()
+
+    qthread = QThread(process_item=process_item)
+    qthread.start()
+    for i in range(100):
+        qthread.put(i)
+
+    _wait_for(done)
+    qthread.shutdown(wait=True)
+    assert processed == list(range(100))
+
+
+def test_items_of_concurrent_producers_are_neither_lost_nor_reordered():
+    producers = 4
+    items_per_producer = 20000
+    processed = []
+    done = threading.Event()
+
+    def process_item(item):
+        processed.append(item)
+        if len(processed) == producers * items_per_producer:
+            done.set()
+
+    qthread = QThread(process_item=process_item)
+    qthread.start()
+
+    def produce(producer):
+        for i in range(items_per_producer):
+            qthread.put((producer, i))
+
+    threads = [threading.Thread(target=produce, args=(producer,)) for producer in range(producers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    _wait_for(done)
+    qthread.shutdown(wait=True)
+    for producer in range(producers):
+        assert [i for p, i in processed if p == producer] == list(range(items_per_producer))
+
+
+def test_items_are_processed_in_batches_of_maximum_size():
+    batches = []
+    done = threading.Event()
+    release = threading.Event()
+
+    def process_batch(items):
+        release.wait(timeout=10)
+        batches.append(items)
+        if sum(len(batch) for batch in batches) == 11:
+            done.set()
+
+    qthread = QThread(process_batch=process_batch, max_batch_size=5)
+    qthread.start()
+    for i in range(11):
+        qthread.put(i)
+    release.set()
+
+    _wait_for(done)
+    qthread.shutdown(wait=True)
+    assert [item for batch in batches for item in batch] == list(range(11))
+    assert all(len(batch) <= 5 for batch in batches)
+
+
+def test_items_are_not_processed_before_start():
+    processed = []
+    done = threading.Event()
+
+    def process_item(item):
+        processed.append(item)
+        done.set()
+
+    qthread = QThread(process_item=process_item)
+    qthread.put('item')
+    assert not processed
+
+    qthread.start()
+    _wait_for(done)
+    qthread.shutdown(wait=True)
+    assert processed == ['item']
+
+
+def test_an_exception_does_not_stop_the_processing():
+    processed = []
+    done = threading.Event()
+
+    def process_item(item):
+        if item == 'fail':
+            raise ValueError(item)
+        processed.append(item)
+        done.set()
+
+    qthread = QThread(process_item=process_item)
+    qthread.start()
+    qthread.put('fail')
+    qthread.put('ok')
+
+    _wait_for(done)
+    qthread.shutdown(wait=True)
+    assert processed == ['ok']
+
+
+def test_qthreads_can_share_an_executor():
+    executor = ThreadPoolExecutor(max_workers=1)
+    processed = []
+    done = threading.Event()
+
+    def process_item(item):
+        processed.append(item)
+        if len(processed) == 2:
+            done.set()
+
+    qthreads = [QThread(process_item=process_item, executor=executor) for _ in range(2)]
+    for i, qthread in enumerate(qthreads):
+        qthread.start()
+        qthread.put(i)
+
+    _wait_for(done)
+    for qthread in qthreads:
+        qthread.shutdown()
+    # The shared executor is not shut down by the QThreads.
+    assert executor.submit(lambda: 'still running').result(timeout=10) == 'still running'
+    executor.shutdown()
+    assert sorted(processed) == [0, 1]
+
+
+def test_queue_can_be_cleared():
+    queue = LockFreeQueue()
+    for i in range(3):
+        queue.put(i)
+
+    assert queue.clear() == 3
+    assert queue.empty()
+
+
+def test_items_that_are_not_batchable_are_processed_on_their_own():
+    batches = []
+    done = threading.Event()
+    release = threading.Event()
+
+    def process_batch(items):
+        release.wait(timeout=10)
+        batches.append(items)
+        if sum(len(batch) for batch in batches) == 6:
+            done.set()
+
+    qthread = QThread(process_batch=process_batch, batchable=lambda item: item.startswith('send'))
+    qthread.start()
+    for item in ['send1', 'send2', 'handle1', 'handle2', 'send3', 'send4']:
+        qthread.put(item)
+    release.set()
+
+    _wait_for(done)
+    qthread.shutdown(wait=True)
+    assert [item for batch in batches for item in batch] == ['send1', 'send2', 'handle1', 'handle2', 'send3', 'send4']
+    assert ['handle1'] in batches and ['handle2'] in batches
+
+
+def test_clearing_the_queue_discards_items_not_processed_yet():
+    processed = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def process_batch(items):
+        processed.extend(items)
+        started.set()
+        release.wait(timeout=10)
+
+    qthread = QThread(process_batch=process_batch, batchable=lambda item: False)
+    qthread.start()
+    qthread.put('first')
+    _wait_for(started)
+    qthread.put('stale1')
+    qthread.put('stale2')
+    qthread.clear_queue()
+    release.set()
+
+    qthread.shutdown(wait=True)
+    assert processed == ['first']
+
+
+def test_items_are_not_processed_after_shutdown():
+    processed = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def process_item(item):
+        processed.append(item)
+        started.set()
+        release.wait(timeout=10)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    qthread = QThread(process_item=process_item, executor=executor)
+    qthread.start()
+    for i in range(5):
+        qthread.put(i)
+    _wait_for(started)
+
+    qthread.shutdown()
+    qthread.put(99)
+    release.set()
+
+    executor.shutdown(wait=True)
+    assert processed == [0]
@@ -0,0 +1,49 @@
+import pytest
+
+from adapter.generic.util.framing import decode_frames, decode_varint, encode_frames, encode_varint
+
+
+def test_small_integers_are_encoded_in_a_single_byte():
+    assert encode_varint(0) == b'\x00'
+    assert encode_varint(1) == b'\x01'
+    assert encode_varint(127) == b'\x7f'
+
+
+def test_large_integers_are_encoded_in_multiple_bytes():
+    assert encode_varint(128) == b'\x80\x01'
+    assert encode_varint(300) == b'\xac\x02'
+
+
+def test_varint_encoding_and_decoding_is_symmetric():
+    for value in [0, 1, 127, 128, 300, 16384, 2 ** 32, 2 ** 63]:
+        assert decode_varint(encode_varint(value)) == (value, len(encode_varint(value)))
+
+
+def test_varint_can_be_decoded_from_an_offset():
+    assert decode_varint(b'\xff\xac\x02\x00', 1) == (300, 3)
+
+
+def test_truncated_varint_can_not_be_decoded():
+    with pytest.raises(ValueError):
+        decode_varint(b'\x80')
+
+
+def test_frames_are_prefixed_with_their_length():
+    assert encode_frames([b'abc', b'', b'de']) == [b'\x03abc\x00\x02de']
+
+
+def test_frames_are_split_over_payloads_of_maximum_size():
+    payloads = encode_frames([b'a' * 10, b'b' * 10, b'c' * 30], max_batch_bytes=25)
+
+    assert payloads == [b'\x0a' + b'a' * 10 + b'\x0a' + b'b' * 10, b'\x1e' + b'c' * 30]
+
+
+def test_framing_and_unframing_is_symmetric():
+    frames = [b'', b'x' * 200, b'\x00\x01\x02']
+
+    assert decode_frames(encode_frames(frames)[0]) == frames
+
+
+def test_truncated_frame_can_not_be_decoded():
+    with pytest.raises(ValueError):
+        decode_frames(b'\x05abc')
@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+import adapter.matrix.handler as matrix_handler
+from adapter.matrix.handler import Handler
+
+
+class _AdapterCore:
+    """ Stub adapter core that records the messages the handler sends to AMP. """
+
+    def __init__(self):
+        self.sent = []
+
+    def send_stimulus_confirmation(self, pb_label):
+        self.sent.append(('confirmation', pb_label.label))
+
+    def send_response(self, label):
+        self.sent.append(('response', label.name))
+
+    def send_ready(self):
+        self.sent.append(('ready',))
+
+    def send_error(self, message):
+        self.sent.append(('error', message))
+
+
+@pytest.fixture
+def handler():
+    handler = Handler()
+    handler.register_adapter_core(_AdapterCore())
+    yield handler
+    handler._executor.shutdown(wait=True, cancel_futures=True)
+
+
+@pytest.fixture
+def sut(monkeypatch):
+    """ Replaces the sleep standing in for the SUT by one that blocks until released. """
+    release = threading.Event()
+    monkeypatch.setattr(matrix_handler.time, 'sleep', lambda _: release.wait(timeout=10))
+    yield release
+    release.set()
+
+
+def _stimulus(handler, name):
+    return next(pb_label for pb_label in handler.supported_pb_labels() if pb_label.label == name)
+
+
+def test_stimuli_are_confirmed_and_answered_in_order_before_the_reset(handler, sut):
+    sut.set()
+    handler.stimulate(_stimulus(handler, 'open'))
+    handler.stimulate(_stimulus(handler, 'close'))
+
+    assert handler.reset() is None
+    assert handler.adapter_core.sent == [
+        ('confirmation', 'open'), ('response', 'opened'),
+        ('confirmation', 'close'), ('response', 'closed'),
+        ('ready',),
+    ]
+
+
+def test_reset_waits_for_the_pending_stimuli(handler, sut):
+    handler.stimulate(_stimulus(handler, 'open'))
+    reset = threading.Thread(target=handler.reset)
+    reset.start()
+
+    reset.join(timeout=0.1)
+    assert reset.is_alive()
+    assert handler.adapter_core.sent == [('confirmation', 'open')]
+
+    sut.set()
+    reset.join(timeout=10)
+    assert handler.adapter_core.sent == [('confirmation', 'open'), ('response', 'opened'), ('ready',)]
+
+
+def test_reset_gives_up_on_a_hung_sut(handler, sut, monkeypatch):
+    monkeypatch.setattr(matrix_handler, '_RESET_TIMEOUT', 0.1)
+    handler.stimulate(_stimulus(handler, 'open'))
+    handler.stimulate(_stimulus(handler, 'close'))
+
+    assert handler.reset() == '2 stimuli did not finish within 0.1 seconds'
+    assert ('ready',) not in handler.adapter_core.sent
+
+
+def test_stop_cancels_only_the_stimuli_that_have_not_started(handler, sut):
+    handler.stimulate(_stimulus(handler, 'open'))
+    handler.stimulate(_stimulus(handler, 'close'))
+    for _ in range(1000):
+        if handler.adapter_core.sent == [('confirmation', 'open')]:
+            break
+        threading.Event().wait(0.01)
+
+    handler.stop()
+    sut.set()
+    handler._executor.shutdown(wait=True)
+
+    assert handler.adapter_core.sent == [('confirmation', 'open'), ('response', 'opened')]
+
+
+def test_an_error_at_the_sut_is_sent_to_amp(handler, monkeypatch):
+    def fail(_):
+        raise OSError('SUT is gone')
+
+    monkeypatch.setattr(matrix_handler.time, 'sleep', fail)
+    handler.stimulate(_stimulus(handler, 'open'))
+    handler._executor.shutdown(wait=True)
+
+    assert handler.adapter_core.sent == [
+        ('confirmation', 'open'), ('error', 'error while stimulating the SUT: SUT is gone'),
+    ]